@@ -1,28 +1,33 @@
 from __future__ import annotations
 import datetime as dt
 from typing import List, Dict, Literal, Optional
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from . import models
+from .archive import transactions_query
 
 RiskLevel = Literal["low", "medium", "high"]
 
 def summarize_spending(db: Session, user_id: int, days: int = 30) -> Dict:
     since = dt.date.today() - dt.timedelta(days=days)
-    txns: List[models.Transaction] = (
-        db.query(models.Transaction)
-        .filter(models.Transaction.user_id == user_id, models.Transaction.date >= since)
-        .all()
-    )
+    # Aggregate in SQL; only reaches into archived history when the window needs it.
+    txns = transactions_query(db, user_id=user_id, since=since)
+    rows = db.execute(
+        select(txns.c.date, txns.c.category, func.sum(txns.c.amount), func.count())
+        .group_by(txns.c.date, txns.c.category)
+    ).all()
 
     total = 0.0
+    tx_count = 0
     by_cat: Dict[str, float] = {}
     by_day: Dict[dt.date, float] = {}
 
-    for t in txns:
-        amt = float(t.amount)
+    for day, category, amount, count in rows:
+        amt = float(amount)
         total += amt
-        by_cat[t.category] = by_cat.get(t.category, 0.0) + amt
-        by_day[t.date] = by_day.get(t.date, 0.0) + amt
+        tx_count += count
+        by_cat[category] = by_cat.get(category, 0.0) + amt
+        by_day[day] = by_day.get(day, 0.0) + amt
 
     budgets: List[models.Budget] = (
         db.query(models.Budget)
@@ -40,7 +45,7 @@ def summarize_spending(db: Session, user_id: int, days: int = 30) -> Dict:
         "avg_per_day": round(avg_per_day, 2),
         "spend_by_category": {k: round(v, 2) for k, v in by_cat.items()},
         "budgets": budget_map,
-        "transaction_count": len(txns),
+        "transaction_count": tx_count,
         "peak_day": peak_day[0].isoformat() if peak_day else None,
         "peak_day_amount": round(peak_day[1], 2) if peak_day else 0.0,
     }
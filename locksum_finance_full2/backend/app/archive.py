@@ -0,0 +1,297 @@
+from __future__ import annotations
+import argparse
+import datetime as dt
+import logging
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, delete, func, insert, select, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+from . import models
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+# Arbitrary key for pg_try_advisory_lock so only one worker archives at a time.
+_PG_LOCK_KEY = 0x4C4B534D
+
+def _month_start(d: dt.date) -> dt.date:
+    return d.replace(day=1)
+
+def _next_month(d: dt.date) -> dt.date:
+    return (d.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+
+def hot_cutoff(today: Optional[dt.date] = None, hot_months: Optional[int] = None) -> dt.date:
+    """First day of the oldest month that stays in the hot `transactions` table."""
+    today = today or dt.date.today()
+    hot_months = settings.ARCHIVE_HOT_MONTHS if hot_months is None else hot_months
+    index = today.year * 12 + today.month - 1 - max(hot_months - 1, 0)
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+def _sqlite_autoincrement(engine: Engine) -> None:
+    """Rebuild a pre-existing SQLite `transactions` table with AUTOINCREMENT.
+
+    Without it SQLite hands out max(rowid)+1, so once the newest row is archived the next
+    insert would reuse its id.
+    """
+    table = models.Transaction.__table__
+    with engine.connect() as conn:
+        ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"))
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return
+    cols = ", ".join(c.name for c in table.columns)
+    statements = [
+        "ALTER TABLE transactions RENAME TO transactions_legacy",
+        *(f"DROP INDEX IF EXISTS {index.name}" for index in table.indexes),
+        str(CreateTable(table).compile(dialect=engine.dialect)).strip(),
+        *(str(CreateIndex(index).compile(dialect=engine.dialect)) for index in table.indexes),
+        f"INSERT INTO transactions ({cols}) SELECT {cols} FROM transactions_legacy",
+        "DROP TABLE transactions_legacy",
+        # Never hand out an id that already moved to the archive.
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'transactions', 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'transactions')",
+        "UPDATE sqlite_sequence SET seq = max(seq, "
+        "(SELECT coalesce(max(id), 0) FROM transactions), "
+        "(SELECT coalesce(max(id), 0) FROM transactions_archive)) WHERE name = 'transactions'",
+    ]
+    # executescript runs the explicit BEGIN/COMMIT as written, so the rebuild is all-or-nothing.
+    raw = engine.raw_connection()
+    try:
+        raw.driver_connection.executescript("BEGIN;\n" + ";\n".join(statements) + ";\nCOMMIT;")
+    finally:
+        raw.close()
+    log.info("rebuilt transactions table with AUTOINCREMENT")
+
+def ensure_storage(engine: Engine) -> None:
+    """Bring tables that already existed up to date; create_all only creates missing tables."""
+    if engine.dialect.name == "sqlite":
+        _sqlite_autoincrement(engine)
+    for index in models.Transaction.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+def get_watermark(db: Session) -> Optional[dt.date]:
+    row = db.get(models.ArchiveWatermark, 1)
+    return row.archived_before if row else None
+
+def transactions_query(
+    db: Session,
+    user_id: Optional[int] = None,
+    since: Optional[dt.date] = None,
+    until: Optional[dt.date] = None,
+):
+    """Hot transactions, plus archived ones only when the range reaches before the watermark.
+
+    Returns a subquery with the Transaction columns. Filters are applied inside each branch so
+    Postgres prunes archive partitions; both branches run as one statement, so a concurrent
+    archival run can't make a row appear twice or not at all.
+    """
+    def branch(t):
+        stmt = select(t.id, t.user_id, t.name, t.amount, t.date, t.category)
+        if user_id is not None:
+            stmt = stmt.where(t.user_id == user_id)
+        if since is not None:
+            stmt = stmt.where(t.date >= since)
+        if until is not None:
+            stmt = stmt.where(t.date < until)
+        return stmt
+
+    stmt = branch(models.Transaction)
+    watermark = get_watermark(db)
+    if watermark is not None and (since is None or since < watermark):
+        stmt = union_all(branch(models.TransactionArchive), stmt)
+    return stmt.subquery("txns")
+
+def monthly_category_totals(
+    db: Session,
+    user_id: int,
+    since: Optional[dt.date] = None,
+    until: Optional[dt.date] = None,
+) -> List[Dict]:
+    """Spend per (month, category): summaries for archived months, live totals for hot rows.
+
+    Archived months can't be split, so the range is widened to whole months: every month
+    that overlaps [since, until) is returned in full.
+    """
+    s = models.MonthlyCategorySummary
+    t = models.Transaction
+    archived = select(s.month, s.category, s.total, s.count).where(s.user_id == user_id)
+    hot = select(t.date, t.category, func.sum(t.amount), func.count()).where(t.user_id == user_id)
+    if since is not None:
+        archived = archived.where(s.month >= _month_start(since))
+        hot = hot.where(t.date >= _month_start(since))
+    if until is not None:
+        until = until if until.day == 1 else _next_month(until)
+        archived = archived.where(s.month < until)
+        hot = hot.where(t.date < until)
+    hot = hot.group_by(t.date, t.category)
+
+    totals: Dict[Tuple[dt.date, str], List] = {}
+    for day, category, total, count in db.execute(union_all(archived, hot)):
+        entry = totals.setdefault((_month_start(day), category), [0.0, 0])
+        entry[0] += float(total)
+        entry[1] += count
+    return [
+        {"month": month, "category": category, "total": round(total, 2), "count": count}
+        for (month, category), (total, count) in sorted(totals.items())
+    ]
+
+def _ensure_partition(engine: Engine, start: dt.date, end: dt.date) -> None:
+    """Create the month's archive partition in its own short transaction.
+
+    CREATE TABLE ... PARTITION OF locks the parent table against readers until commit, so it
+    must not share a transaction with the row move. lock_timeout makes it fail (the next run
+    retries) rather than queue readers behind it while a long query holds the parent.
+    """
+    name = f"transactions_archive_y{start.year}m{start.month:02d}"
+    with engine.begin() as conn:
+        if conn.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is not None:
+            return
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF transactions_archive "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+
+def archive_month(db: Session, start: dt.date, end: dt.date, max_id: int) -> int:
+    """Move one month of hot rows (id <= max_id) to the archive and fold them into summaries.
+
+    The move runs inside the caller's transaction (which must not have touched
+    transactions_archive yet); returns the number of rows moved.
+    """
+    t = models.Transaction
+    in_month = and_(t.date >= start, t.date < end, t.id <= max_id)
+    per_user_cat = db.execute(
+        select(t.user_id, t.category, func.sum(t.amount), func.count())
+        .where(in_month)
+        .group_by(t.user_id, t.category)
+    ).all()
+    if not per_user_cat:
+        return 0
+
+    if _is_postgres(db.get_bind()):
+        _ensure_partition(db.get_bind(), start, end)
+
+    # Backdated rows can land in a month that was archived before; add to its summary.
+    s = models.MonthlyCategorySummary
+    existing = {(r.user_id, r.category): r for r in db.query(s).filter(s.month == start)}
+    for user_id, category, total, count in per_user_cat:
+        row = existing.get((user_id, category))
+        if row is None:
+            db.add(s(user_id=user_id, month=start, category=category, total=float(total), count=count))
+        else:
+            row.total += float(total)
+            row.count += count
+    db.flush()
+
+    cols = ["id", "user_id", "name", "amount", "date", "category"]
+    db.execute(
+        insert(models.TransactionArchive).from_select(
+            cols, select(t.id, t.user_id, t.name, t.amount, t.date, t.category).where(in_month)
+        )
+    )
+    moved = db.execute(delete(t).where(in_month).execution_options(synchronize_session=False))
+    return moved.rowcount
+
+def run_archival(db: Session, today: Optional[dt.date] = None, hot_months: Optional[int] = None) -> Dict:
+    """Archive every month older than the hot window, one transaction per month."""
+    lock_conn = None
+    if _is_postgres(db.get_bind()):
+        # Session-level lock on a dedicated connection; the session's own connection
+        # goes back to the pool on every commit.
+        lock_conn = db.get_bind().connect()
+        locked = lock_conn.scalar(text("SELECT pg_try_advisory_lock(:k)"), {"k": _PG_LOCK_KEY})
+        lock_conn.commit()
+        if not locked:
+            lock_conn.close()
+            return {"skipped": "another archival run holds the lock"}
+    try:
+        cutoff = hot_cutoff(today, hot_months)
+        t = models.Transaction
+        max_id = db.scalar(select(func.max(t.id)))
+        oldest = db.scalar(select(func.min(t.date)).where(t.date < cutoff))
+        if max_id is None or oldest is None:
+            return {"cutoff": cutoff.isoformat(), "months": 0, "moved": 0}
+
+        # Raise the watermark first: readers then include the archive for anything before
+        # `cutoff`, so rows are visible in exactly one table while months move.
+        mark = db.get(models.ArchiveWatermark, 1)
+        if mark is None:
+            db.add(models.ArchiveWatermark(id=1, archived_before=cutoff))
+        elif mark.archived_before < cutoff:
+            mark.archived_before = cutoff
+        db.commit()
+
+        months = moved = 0
+        start = _month_start(oldest)
+        while start < cutoff:
+            end = _next_month(start)
+            n = archive_month(db, start, end, max_id)
+            db.commit()
+            if n:
+                months += 1
+                moved += n
+                log.info("archived %d transactions for %s", n, start.strftime("%Y-%m"))
+            start = end
+        return {"cutoff": cutoff.isoformat(), "months": months, "moved": moved}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _PG_LOCK_KEY})
+            lock_conn.close()
+
+def start_background_archiver(session_factory, interval_hours: float) -> Optional[threading.Event]:
+    """Run `run_archival` every `interval_hours` in a daemon thread; set the returned event to stop it.
+
+    Postgres only: every worker starts a thread and the advisory lock picks one run. SQLite has
+    no such lock, so concurrent runs would fail with "database is locked"; schedule
+    `python -m app.archive` from cron there instead.
+    """
+    db = session_factory()
+    try:
+        pg = _is_postgres(db.get_bind())
+    finally:
+        db.close()
+    if not pg:
+        log.warning("ARCHIVE_INTERVAL_HOURS is ignored on this database; run `python -m app.archive` from cron")
+        return None
+
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_hours * 3600):
+            db = session_factory()
+            try:
+                run_archival(db)
+            except Exception:
+                log.exception("transaction archival failed")
+            finally:
+                db.close()
+
+    threading.Thread(target=loop, name="txn-archiver", daemon=True).start()
+    return stop
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move cold transactions to archive storage.")
+    parser.add_argument("--hot-months", type=int, default=None, help=f"default: {settings.ARCHIVE_HOT_MONTHS}")
+    args = parser.parse_args(argv)
+
+    from .database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    ensure_storage(engine)
+    db = SessionLocal()
+    try:
+        print(run_archival(db, hot_months=args.hot_months))
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
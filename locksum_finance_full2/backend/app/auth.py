@@ -50,3 +50,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if not user:
         raise cred_exc
     return user
+
+def is_admin(user: models.User) -> bool:
+    admins = {e.strip().lower() for e in settings.ADMIN_EMAILS.split(",") if e.strip()}
+    return user.email.lower() in admins
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import datetime as dt
+import hashlib
+import json
+from email.utils import format_datetime
+from typing import Optional, Tuple
+from fastapi import Request, Response
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from . import models
+
+_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def bump_data_version(db: Session, user_id: int) -> None:
+    """Invalidate the user's cached lists; call inside the writing transaction, before commit."""
+    now = dt.datetime.utcnow()
+    v = models.DataVersion
+    # Single-statement upsert, so a user's first two concurrent writes can't both insert.
+    stmt = _INSERT[db.get_bind().dialect.name](v).values(user_id=user_id, version=1, updated_at=now)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[v.user_id],
+        set_={"version": v.version + 1, "updated_at": now},
+    ))
+
+def get_data_version(db: Session, user_id: int) -> Tuple[int, Optional[dt.datetime]]:
+    row = db.get(models.DataVersion, user_id)
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
+
+def make_etag(user_id: int, version: int, resource: str, *variant) -> str:
+    tag = f"{user_id}-{version}-{resource}"
+    if variant:
+        digest = hashlib.sha1(json.dumps(variant, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        tag += f"-{digest}"
+    return f'W/"{tag}"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): ignore W/ prefixes.
+    wanted = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == wanted for t in header.split(","))
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    db: Session,
+    user_id: int,
+    resource: str,
+    *variant,
+) -> Optional[Response]:
+    """Return a 304 response if the client's copy is current; otherwise set validators on `response`.
+
+    `variant` is anything besides the user's data that changes the representation
+    (query params, today's date for rolling windows).
+    """
+    if all(v is None for v in variant):
+        variant = ()
+    version, updated_at = get_data_version(db, user_id)
+    headers = {
+        "ETag": make_etag(user_id, version, resource, *variant),
+        "Cache-Control": "private, no-cache",
+    }
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(updated_at.replace(tzinfo=dt.timezone.utc), usegmt=True)
+
+    # If-Modified-Since is deliberately ignored: Last-Modified has one-second resolution,
+    # so a second write within the same second would be reported as unmodified.
+    inm = request.headers.get("if-none-match")
+    if inm is not None and _etag_matches(inm, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
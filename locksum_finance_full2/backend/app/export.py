@@ -0,0 +1,156 @@
+from __future__ import annotations
+import argparse
+import csv
+import io
+import sys
+from typing import IO, Iterable, Iterator, List, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .archive import transactions_query
+
+EXPORT_COLUMNS = ("id", "user_id", "name", "amount", "date", "category")
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+DEFAULT_CHUNK_SIZE = 50_000
+
+Row = Sequence
+Chunk = List[Row]
+
+def iter_transaction_chunks(db: Session, user_id: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Chunk]:
+    """Yield transactions as plain row tuples, `chunk_size` at a time, from a server-side cursor.
+
+    Selecting columns (not ORM entities) keeps rows out of the identity map, so memory is
+    bounded by one chunk. Includes archived transactions. Pass user_id=None to export every
+    user's transactions.
+    """
+    txns = transactions_query(db, user_id=user_id)
+    stmt = select(txns).order_by(txns.c.id)
+    # Core execution on the session's connection: skips ORM row processing entirely.
+    result = db.connection().execute(stmt.execution_options(yield_per=chunk_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+# Spreadsheets evaluate cells starting with these as formulas (CSV injection); such text
+# is prefixed with ' so it opens as plain text. Parquet columns are typed and left alone.
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _text_cell(value: str) -> str:
+    return "'" + value if value.startswith(_FORMULA_PREFIXES) else value
+
+def iter_csv(chunks: Iterable[Chunk]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        # name and category are the only user-controlled text columns.
+        writer.writerows(
+            (id_, user_id, _text_cell(name), amount, date, _text_cell(category))
+            for id_, user_id, name, amount, date, category in chunk
+        )
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+class _DrainableSink:
+    """Write-only file object for pyarrow; bytes written so far are handed off by `drain()`."""
+
+    def __init__(self):
+        self._buf = io.BytesIO()
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        n = self._buf.write(data)
+        self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = self._buf.getvalue()
+        self._buf.seek(0)
+        self._buf.truncate()
+        return data
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+    return pyarrow
+
+def iter_parquet(chunks: Iterable[Chunk]) -> Iterator[bytes]:
+    """Stream a Parquet file, one row group per chunk."""
+    pa = _arrow()
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("name", pa.string()),
+        ("amount", pa.float64()),
+        ("date", pa.date32()),
+        ("category", pa.string()),
+    ])
+    sink = _DrainableSink()
+    writer = pa.parquet.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            batch = pa.record_batch(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch, row_group_size=len(chunk))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def stream_export(db: Session, fmt: str, user_id: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    chunks = iter_transaction_chunks(db, user_id=user_id, chunk_size=chunk_size)
+    if fmt == "parquet":
+        return iter_parquet(chunks)
+    return iter_csv(chunks)
+
+def write_export(db: Session, out: IO[bytes], fmt: str, user_id: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Write an export to a binary file object; returns the number of bytes written."""
+    written = 0
+    for data in stream_export(db, fmt, user_id=user_id, chunk_size=chunk_size):
+        out.write(data)
+        written += len(data)
+    return written
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export transactions as CSV or Parquet.")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--user-id", type=int, default=None, help="limit to one user (default: all users)")
+    parser.add_argument("--output", "-o", default="-", help="output path, or - for stdout")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.output == "-":
+            write_export(db, sys.stdout.buffer, args.format, args.user_id, args.chunk_size)
+        else:
+            with open(args.output, "wb") as out:
+                write_export(db, out, args.format, args.user_id, args.chunk_size)
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
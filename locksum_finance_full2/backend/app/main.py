@@ -1,19 +1,37 @@
-from fastapi import FastAPI, Depends, HTTPException
+import datetime as dt
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from .database import Base, engine, get_db
+from .database import Base, engine, get_db, SessionLocal
 from . import models, schemas
-from .auth import authenticate_user, create_access_token, hash_password, get_current_user
+from .auth import authenticate_user, create_access_token, hash_password, get_current_user, is_admin
 from .ai import build_ai_insights, build_debt_plan
+from .archive import ensure_storage, monthly_category_totals, start_background_archiver, transactions_query
+from .etags import bump_data_version, check_not_modified
+from .export import EXPORT_FORMATS, stream_export
 from .plans import require_min_plan
+from .ratelimit import Admission, admission, admission_metrics, export_limiter, renewing
 from .plaid_integration import router as plaid_router
 from .stripe_billing import router as billing_router
 from .settings import settings
 
 Base.metadata.create_all(bind=engine)
+ensure_storage(engine)
 
-app = FastAPI(title="Locksum Finance API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop_archiver = None
+    if settings.ARCHIVE_INTERVAL_HOURS > 0:
+        stop_archiver = start_background_archiver(SessionLocal, settings.ARCHIVE_INTERVAL_HOURS)
+    yield
+    if stop_archiver is not None:
+        stop_archiver.set()
+
+app = FastAPI(title="Locksum Finance API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
 app.include_router(plaid_router)
@@ -57,39 +76,124 @@ def me(user=Depends(get_current_user)):
 def create_txn(txn: schemas.TransactionCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
     obj = models.Transaction(user_id=user.id, **txn.dict())
     db.add(obj)
+    bump_data_version(db, user.id)
     db.commit()
     db.refresh(obj)
     return obj
 
 @app.get("/transactions", response_model=list[schemas.TransactionOut])
-def list_txns(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.Transaction).filter(models.Transaction.user_id == user.id).all()
+def list_txns(
+    request: Request,
+    response: Response,
+    since: dt.date | None = None,
+    until: dt.date | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    not_modified = check_not_modified(request, response, db, user.id, "transactions", since, until)
+    if not_modified:
+        return not_modified
+    txns = transactions_query(db, user_id=user.id, since=since, until=until)
+    return db.execute(select(txns).order_by(txns.c.date, txns.c.id)).mappings().all()
+
+@app.get("/transactions/monthly-summary", response_model=list[schemas.MonthlySummaryOut])
+def monthly_summary(
+    since: dt.date | None = None,
+    until: dt.date | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    return monthly_category_totals(db, user.id, since=since, until=until)
+
+@app.get("/transactions/export")
+def export_txns(
+    fmt: str = Query("csv", alias="format"),
+    all_users: bool = False,
+    user=Depends(get_current_user),
+    admit: Admission = Depends(admission),
+):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid export format")
+    if all_users and not is_admin(user):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    owner_id = None if all_users else user.id
+    slot = admit("export", limiter=export_limiter)
+
+    def body():
+        # Own session: the request-scoped one is closed before the response finishes streaming.
+        db = SessionLocal()
+        try:
+            chunks = stream_export(db, fmt, user_id=owner_id)
+            yield from renewing(chunks, export_limiter, slot, settings.EXPORT_LEASE_SECONDS / 3)
+        finally:
+            db.close()
+
+    filename = f"transactions.{fmt}"
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @app.post("/budgets", response_model=schemas.BudgetOut)
 def create_budget(b: schemas.BudgetCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
     obj = models.Budget(user_id=user.id, **b.dict())
     db.add(obj)
+    bump_data_version(db, user.id)
     db.commit()
     db.refresh(obj)
     return obj
 
 @app.get("/budgets", response_model=list[schemas.BudgetOut])
-def list_budgets(db: Session = Depends(get_db), user=Depends(get_current_user)):
+def list_budgets(request: Request, response: Response, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    not_modified = check_not_modified(request, response, db, user.id, "budgets")
+    if not_modified:
+        return not_modified
     return db.query(models.Budget).filter(models.Budget.user_id == user.id).all()
 
 # AI endpoints
-@app.post("/ai/insights")
+@app.get("/ai/insights")
 def ai_insights(
+    request: Request,
+    response: Response,
+    days: int = 30,
+    monthly_savings_target: float | None = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    admit: Admission = Depends(admission),
+):
+    require_min_plan(user, "plus")
+    goals = {"monthly_savings_target": monthly_savings_target} if monthly_savings_target is not None else None
+    # The window is relative to today, so the date is part of the representation.
+    not_modified = check_not_modified(request, response, db, user.id, "insights", days, goals, dt.date.today())
+    if not_modified:
+        return not_modified
+    # Revalidations are cheap; only a fresh build spends a token.
+    admit("ai")
+    return build_ai_insights(db, user.id, days=days, goals=goals)
+
+# Kept for existing clients; not cacheable. Prefer GET /ai/insights.
+@app.post("/ai/insights")
+def ai_insights_post(
     payload: schemas.AIGoals | None = None,
     days: int = 30,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
+    admit: Admission = Depends(admission),
 ):
     require_min_plan(user, "plus")
     goals = payload.dict() if payload else None
+    admit("ai")
     return build_ai_insights(db, user.id, days=days, goals=goals)
 
 @app.post("/ai/debt-plan")
 def ai_debt_plan(body: schemas.DebtPlanRequest):
     risk = body.risk if body.risk in {"low", "medium", "high"} else "medium"
     return build_debt_plan(body.total_debt, body.monthly_extra, risk=risk)
+
+# Admission control counters (per worker process)
+@app.get("/metrics/admission")
+def admission_stats(user=Depends(get_current_user)):
+    if not is_admin(user):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return admission_metrics.snapshot()
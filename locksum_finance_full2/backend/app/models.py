@@ -1,7 +1,7 @@
 from __future__ import annotations
 import datetime as dt
 from typing import List, Optional
-from sqlalchemy import String, Integer, Float, Date, DateTime, ForeignKey
+from sqlalchemy import String, Integer, Float, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .database import Base
 
@@ -24,6 +24,12 @@ class User(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_date", "user_id", "date"),
+        Index("ix_transactions_date", "date"),
+        # Archived ids must never be handed out again (SQLite otherwise reuses max(rowid)+1).
+        {"sqlite_autoincrement": True},
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     name: Mapped[str] = mapped_column(String(255))
@@ -32,6 +38,38 @@ class Transaction(Base):
     category: Mapped[str] = mapped_column(String(128), default="Uncategorized")
     user: Mapped["User"] = relationship(back_populates="transactions")
 
+class TransactionArchive(Base):
+    """Cold transactions moved out of `transactions` by the archival job (see archive.py).
+
+    Range-partitioned by month on Postgres (date must be part of the key); a plain table elsewhere.
+    """
+    __tablename__ = "transactions_archive"
+    __table_args__ = (
+        Index("ix_transactions_archive_user_date", "user_id", "date"),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    name: Mapped[str] = mapped_column(String(255))
+    amount: Mapped[float] = mapped_column(Float)
+    date: Mapped[dt.date] = mapped_column(Date, primary_key=True)
+    category: Mapped[str] = mapped_column(String(128), default="Uncategorized")
+
+class MonthlyCategorySummary(Base):
+    """Per-user, per-category totals for archived months."""
+    __tablename__ = "monthly_category_summaries"
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    month: Mapped[dt.date] = mapped_column(Date, primary_key=True)  # first day of the month
+    category: Mapped[str] = mapped_column(String(128), primary_key=True)
+    total: Mapped[float] = mapped_column(Float, default=0.0)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+class ArchiveWatermark(Base):
+    """Single row: every archived transaction is dated before `archived_before`."""
+    __tablename__ = "archive_watermark"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    archived_before: Mapped[dt.date] = mapped_column(Date)
+
 class Budget(Base):
     __tablename__ = "budgets"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -48,3 +86,10 @@ class PlaidItem(Base):
     item_id: Mapped[str] = mapped_column(String(255))
     institution_name: Mapped[str] = mapped_column(String(255), default="")
     user: Mapped["User"] = relationship(back_populates="plaid_items")
+
+class DataVersion(Base):
+    """Per-user counter bumped on every transaction/budget write; drives ETags."""
+    __tablename__ = "data_versions"
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
@@ -14,6 +14,7 @@ from .settings import settings
 from . import models, schemas
 from .auth import get_current_user
 from .plans import require_min_plan
+from .ratelimit import Admission, admission
 
 router = APIRouter(prefix="/plaid", tags=["Plaid"])
 
@@ -29,9 +30,10 @@ def _plaid_client() -> plaid_api.PlaidApi:
     return plaid_api.PlaidApi(api_client)
 
 @router.post("/link-token", response_model=schemas.PlaidLinkTokenOut)
-def create_link_token(user=Depends(get_current_user)):
+def create_link_token(user=Depends(get_current_user), admit: Admission = Depends(admission)):
     require_min_plan(user, "plus")
     client = _plaid_client()
+    admit("plaid")
     req = LinkTokenCreateRequest(
         products=[Products("transactions")],
         client_name="Locksum Finance",
@@ -48,9 +50,11 @@ def exchange_public_token(
     body: schemas.PlaidPublicTokenExchange,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
+    admit: Admission = Depends(admission),
 ):
     require_min_plan(user, "plus")
     client = _plaid_client()
+    admit("plaid")
     req = ItemPublicTokenExchangeRequest(public_token=body.public_token)
     resp = client.item_public_token_exchange(req)
     access_token = resp["access_token"]
@@ -0,0 +1,304 @@
+from __future__ import annotations
+import logging
+import math
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import redis
+from fastapi import Depends, HTTPException, status
+from . import models
+from .auth import get_current_user
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RateLimit:
+    burst: int          # bucket capacity
+    per_minute: float   # steady-state refill
+
+    @property
+    def refill_per_sec(self) -> float:
+        return self.per_minute / 60.0
+
+# Per-user buckets, keyed by the user's effective plan tier.
+TIER_LIMITS: Dict[str, RateLimit] = {
+    "free": RateLimit(burst=5, per_minute=5),
+    "plus": RateLimit(burst=20, per_minute=30),
+    "pro": RateLimit(burst=60, per_minute=120),
+}
+
+def plan_tier(user: models.User) -> str:
+    # Lapsed subscriptions are limited like free accounts (same rule as plans.require_min_plan).
+    if user.plan in TIER_LIMITS and user.subscription_status in {"active", "trialing"}:
+        return user.plan
+    return "free"
+
+class TokenBucket:
+    def __init__(self, limit: RateLimit, now: float):
+        self.limit = limit
+        self.tokens = float(limit.burst)
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Consume `cost` tokens; returns 0 if admitted, else seconds until enough tokens refill."""
+        elapsed = max(now - self.updated, 0.0)
+        self.tokens = min(float(self.limit.burst), self.tokens + elapsed * self.limit.refill_per_sec)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.limit.refill_per_sec
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + max(now - self.updated, 0.0) * self.limit.refill_per_sec >= self.limit.burst
+
+class InMemoryBackend:
+    """Buckets local to this worker process.
+
+    A full bucket behaves exactly like a missing one, so full buckets are dropped every
+    `sweep_seconds`; memory stays proportional to recently active users.
+    """
+
+    def __init__(self, sweep_seconds: float = 60.0):
+        self._buckets: Dict[Tuple[str, int, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._sweep_seconds = sweep_seconds
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _sweep(self, now: float) -> None:
+        self._buckets = {k: b for k, b in self._buckets.items() if not b.is_full(now)}
+        self._last_sweep = now
+
+    def take(self, scope: str, user_id: int, tier: str, cost: float = 1.0) -> float:
+        limit = TIER_LIMITS[tier]
+        now = time.monotonic()
+        key = (scope, user_id, tier)
+        with self._lock:
+            if now - self._last_sweep >= self._sweep_seconds:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(limit, now)
+            return bucket.take(now, cost)
+
+# Atomic refill + take; returns the wait in seconds as a string (0 when admitted).
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisBackend:
+    """Buckets shared by every worker pointed at the same Redis.
+
+    If Redis is unreachable, requests are limited by this worker's local buckets instead.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self._take = client.register_script(_REDIS_TAKE)
+        self._fallback = InMemoryBackend()
+
+    def take(self, scope: str, user_id: int, tier: str, cost: float = 1.0) -> float:
+        limit = TIER_LIMITS[tier]
+        key = f"ratelimit:{scope}:{user_id}:{tier}"
+        try:
+            wait = self._take(keys=[key], args=[limit.burst, limit.refill_per_sec, time.time(), cost])
+        except redis.RedisError as exc:
+            log.warning("rate limit backend unavailable, using local buckets: %s", exc)
+            return self._fallback.take(scope, user_id, tier, cost)
+        return float(wait)
+
+_LOCAL_SLOT = "local"
+
+class ConcurrencyLimiter:
+    """Caps in-flight expensive requests in this worker; excess requests are shed, not queued."""
+
+    def __init__(self, max_in_flight: int):
+        self._sem = threading.BoundedSemaphore(max_in_flight)
+
+    def try_acquire(self) -> Optional[str]:
+        """Returns a slot to pass to `release`, or None when full."""
+        return _LOCAL_SLOT if self._sem.acquire(blocking=False) else None
+
+    def release(self, slot: str) -> None:
+        self._sem.release()
+
+    def renew(self, slot: str) -> None:
+        pass  # local slots have no lease
+
+# Each in-flight request holds a lease (member scored by start time) in one sorted set;
+# leases older than ARGV[3] seconds are dropped so a crashed worker can't pin slots forever.
+_REDIS_ACQUIRE = """
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - lease)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(lease))
+return 1
+"""
+
+class RedisConcurrencyLimiter:
+    """In-flight cap shared by every worker pointed at the same Redis.
+
+    If Redis is unreachable, falls back to a per-worker cap of the same size.
+    """
+
+    def __init__(self, client: redis.Redis, key: str, max_in_flight: int, lease_seconds: float):
+        self.key = key
+        self._client = client
+        self._acquire = client.register_script(_REDIS_ACQUIRE)
+        self._max = max_in_flight
+        self._lease = lease_seconds
+        self._fallback = ConcurrencyLimiter(max_in_flight)
+
+    def try_acquire(self) -> Optional[str]:
+        slot = uuid.uuid4().hex
+        try:
+            ok = self._acquire(keys=[self.key], args=[time.time(), self._max, self._lease, slot])
+        except redis.RedisError as exc:
+            log.warning("concurrency backend unavailable, using per-worker cap: %s", exc)
+            return self._fallback.try_acquire()
+        return slot if ok else None
+
+    def release(self, slot: str) -> None:
+        if slot == _LOCAL_SLOT:
+            self._fallback.release(slot)
+            return
+        try:
+            self._client.zrem(self.key, slot)
+        except redis.RedisError as exc:
+            # The lease expires on its own after lease_seconds.
+            log.warning("could not release concurrency slot: %s", exc)
+
+    def renew(self, slot: str) -> None:
+        """Restart the slot's lease; a slot that already expired is not taken back."""
+        if slot == _LOCAL_SLOT:
+            return
+        try:
+            self._client.zadd(self.key, {slot: time.time()}, xx=True)
+        except redis.RedisError as exc:
+            log.warning("could not renew concurrency slot: %s", exc)
+
+class AdmissionMetrics:
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, scope: str, outcome: str) -> None:
+        with self._lock:
+            by_outcome = self._counts.setdefault(scope, {"admitted": 0, "rate_limited": 0, "shed": 0})
+            by_outcome[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {scope: dict(counts) for scope, counts in self._counts.items()}
+
+def _make_limiters():
+    if settings.RATE_LIMIT_REDIS_URL:
+        # Short timeouts and no retries (redis-py 6+ retries with backoff by default), so an
+        # unreachable or hung Redis trips the local fallback instead of stalling requests.
+        client = redis.Redis.from_url(
+            settings.RATE_LIMIT_REDIS_URL,
+            socket_connect_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+            socket_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+            retry=None,
+        )
+        return (
+            RedisBackend(client),
+            RedisConcurrencyLimiter(
+                client, "ratelimit:inflight:expensive",
+                settings.EXPENSIVE_MAX_CONCURRENCY, settings.EXPENSIVE_LEASE_SECONDS,
+            ),
+            RedisConcurrencyLimiter(
+                client, "ratelimit:inflight:export",
+                settings.EXPORT_MAX_CONCURRENCY, settings.EXPORT_LEASE_SECONDS,
+            ),
+        )
+    return (
+        InMemoryBackend(),
+        ConcurrencyLimiter(settings.EXPENSIVE_MAX_CONCURRENCY),
+        ConcurrencyLimiter(settings.EXPORT_MAX_CONCURRENCY),
+    )
+
+backend, expensive_limiter, export_limiter = _make_limiters()
+admission_metrics = AdmissionMetrics()
+
+class Admission:
+    """Per-request handle from the `admission` dependency.
+
+    Call it only once the request is known to run (plan and parameter checks passed), so
+    rejected requests neither spend tokens nor show up as admitted.
+    """
+
+    def __init__(self, user: models.User):
+        self.user = user
+        self._held: List[Tuple[object, str]] = []
+
+    def __call__(self, scope: str, cost: float = 1.0, limiter=None) -> str:
+        """Per-user token bucket (429) then concurrency cap (503); returns the slot taken."""
+        limiter = limiter or expensive_limiter
+        wait = backend.take(scope, self.user.id, plan_tier(self.user), cost)
+        if wait > 0:
+            admission_metrics.record(scope, "rate_limited")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded for your plan. Try again shortly.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+        slot = limiter.try_acquire()
+        if slot is None:
+            admission_metrics.record(scope, "shed")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        admission_metrics.record(scope, "admitted")
+        self._held.append((limiter, slot))
+        return slot
+
+    def release(self) -> None:
+        while self._held:
+            limiter, slot = self._held.pop()
+            limiter.release(slot)
+
+def admission(user=Depends(get_current_user)):
+    """Dependency yielding an `Admission`; its slots are released once the response has been
+    sent, i.e. after the last chunk of a streamed body."""
+    handle = Admission(user)
+    try:
+        yield handle
+    finally:
+        handle.release()
+
+def renewing(chunks: Iterable[bytes], limiter, slot: str, every_seconds: float) -> Iterator[bytes]:
+    """Pass `chunks` through, renewing the slot's lease so a long stream keeps its slot."""
+    renewed = time.monotonic()
+    for chunk in chunks:
+        yield chunk
+        if time.monotonic() - renewed >= every_seconds:
+            limiter.renew(slot)
+            renewed = time.monotonic()
@@ -35,6 +35,12 @@ class TransactionOut(TransactionBase):
     class Config:
         orm_mode = True
 
+class MonthlySummaryOut(BaseModel):
+    month: dt.date
+    category: str
+    total: float
+    count: int
+
 class BudgetBase(BaseModel):
     category: str
     limit_amount: float
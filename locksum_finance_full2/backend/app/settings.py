@@ -11,6 +11,7 @@ class Settings(BaseSettings):
     # Auth / JWT
     JWT_SECRET: str = os.getenv("JWT_SECRET", "CHANGE_ME_SECRET")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
+    ADMIN_EMAILS: str = os.getenv("ADMIN_EMAILS", "")  # comma-separated
 
     # Plaid
     PLAID_CLIENT_ID: str | None = os.getenv("PLAID_CLIENT_ID")
@@ -26,4 +27,20 @@ class Settings(BaseSettings):
     STRIPE_PRICE_ID_PRO_MONTHLY: str | None = os.getenv("STRIPE_PRICE_ID_PRO_MONTHLY")
     STRIPE_PRICE_ID_PRO_YEARLY: str | None = os.getenv("STRIPE_PRICE_ID_PRO_YEARLY")
 
+    # Rate limiting / admission control
+    RATE_LIMIT_REDIS_URL: str | None = os.getenv("RATE_LIMIT_REDIS_URL")  # shared buckets across workers
+    RATE_LIMIT_REDIS_TIMEOUT_SECONDS: float = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT_SECONDS", "0.25"))  # then fall back to local limits
+    # Cap on in-flight expensive requests: shared by all workers when RATE_LIMIT_REDIS_URL is set,
+    # otherwise enforced separately in each worker process.
+    EXPENSIVE_MAX_CONCURRENCY: int = int(os.getenv("EXPENSIVE_MAX_CONCURRENCY", "8"))
+    EXPENSIVE_LEASE_SECONDS: float = float(os.getenv("EXPENSIVE_LEASE_SECONDS", "300"))  # drop slots held longer (crashed workers)
+    # Exports get their own cap so long downloads can't shed /ai/insights; their lease is
+    # renewed while the body streams.
+    EXPORT_MAX_CONCURRENCY: int = int(os.getenv("EXPORT_MAX_CONCURRENCY", "2"))
+    EXPORT_LEASE_SECONDS: float = float(os.getenv("EXPORT_LEASE_SECONDS", "120"))
+
+    # Transaction archival (hot/cold split)
+    ARCHIVE_HOT_MONTHS: int = int(os.getenv("ARCHIVE_HOT_MONTHS", "12"))  # months kept in `transactions`
+    ARCHIVE_INTERVAL_HOURS: float = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "0"))  # Postgres only; 0 = run via CLI/cron only
+
 settings = Settings()
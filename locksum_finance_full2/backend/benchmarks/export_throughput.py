@@ -0,0 +1,80 @@
+"""Export throughput on a synthetic transactions table.
+
+Run from backend/:  python -m benchmarks.export_throughput --rows 10000000
+Uses a throwaway SQLite file unless --database-url is given.
+"""
+from __future__ import annotations
+import argparse
+import datetime as dt
+import os
+import random
+import resource
+import tempfile
+import time
+
+CATEGORIES = ["Groceries", "Rent", "Utilities", "Dining", "Transport", "Shopping", "Savings", "Uncategorized"]
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _seed(engine, models, rows: int, users: int, batch: int = 100_000) -> None:
+    from sqlalchemy import insert
+
+    rng = random.Random(42)
+    start = dt.date.today() - dt.timedelta(days=3650)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"bench{i}@example.com", "password_hash": "x"} for i in range(users)
+        ])
+    for offset in range(0, rows, batch):
+        n = min(batch, rows - offset)
+        with engine.begin() as conn:
+            conn.execute(insert(models.Transaction), [
+                {
+                    "user_id": rng.randint(1, users),
+                    "name": f"Merchant {rng.randint(1, 5000)}",
+                    "amount": round(rng.uniform(1, 500), 2),
+                    "date": start + dt.timedelta(days=rng.randint(0, 3650)),
+                    "category": rng.choice(CATEGORIES),
+                }
+                for _ in range(n)
+            ])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="locksum-export-")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/bench.db"
+
+    from app.database import Base, SessionLocal, engine
+    from app import models
+    from app.export import write_export
+
+    Base.metadata.create_all(bind=engine)
+    t0 = time.perf_counter()
+    _seed(engine, models, args.rows, args.users)
+    print(f"seeded {args.rows:,} rows in {time.perf_counter() - t0:.1f}s (peak RSS {_peak_rss_mb():.0f} MB)")
+
+    for fmt in ("csv", "parquet"):
+        path = os.path.join(workdir, f"export.{fmt}")
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            with open(path, "wb") as out:
+                size = write_export(db, out, fmt, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - t0
+        finally:
+            db.close()
+        print(
+            f"{fmt:8s} {elapsed:7.1f}s  {args.rows / elapsed:12,.0f} rows/s  "
+            f"{size / elapsed / 2**20:7.1f} MiB/s  {size / 2**20:8.1f} MiB  peak RSS {_peak_rss_mb():.0f} MB"
+        )
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
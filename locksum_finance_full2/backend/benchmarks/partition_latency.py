@@ -0,0 +1,128 @@
+"""Per-user query latency as transaction history grows, before and after archival.
+
+Run from backend/:  python -m benchmarks.partition_latency
+Each history size gets its own throwaway SQLite file unless --database-url is given
+(a --database-url run only makes sense with a single --months value).
+"""
+from __future__ import annotations
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CATEGORIES = ["Groceries", "Rent", "Utilities", "Dining", "Transport", "Shopping", "Savings", "Uncategorized"]
+
+def _seed(engine, models, users: int, months: int, per_user_month: int, batch: int = 50_000) -> int:
+    from sqlalchemy import insert
+
+    rng = random.Random(42)
+    today = dt.date.today()
+    span = months * 30
+    total = users * months * per_user_month
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"bench{i}@example.com", "password_hash": "x"} for i in range(users)
+        ])
+    for offset in range(0, total, batch):
+        n = min(batch, total - offset)
+        with engine.begin() as conn:
+            conn.execute(insert(models.Transaction), [
+                {
+                    "user_id": rng.randint(1, users),
+                    "name": f"Merchant {rng.randint(1, 5000)}",
+                    "amount": round(rng.uniform(1, 500), 2),
+                    "date": today - dt.timedelta(days=rng.randint(0, span - 1)),
+                    "category": rng.choice(CATEGORIES),
+                }
+                for _ in range(n)
+            ])
+    return total
+
+def _median_ms(fn, repeat: int) -> float:
+    fn()  # warm up
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+def _measure(SessionLocal, users: int, repeat: int) -> dict:
+    from sqlalchemy import select
+    from app.ai import summarize_spending
+    from app.archive import monthly_category_totals, transactions_query
+
+    since = dt.date.today() - dt.timedelta(days=30)
+    db = SessionLocal()
+    user_ids = list(range(1, users + 1, max(users // 10, 1)))
+    try:
+        def list_recent():
+            for uid in user_ids:
+                txns = transactions_query(db, user_id=uid, since=since)
+                db.execute(select(txns).order_by(txns.c.date, txns.c.id)).all()
+
+        def insights():
+            for uid in user_ids:
+                summarize_spending(db, uid, days=30)
+
+        def monthly():
+            for uid in user_ids:
+                monthly_category_totals(db, uid)
+
+        n = len(user_ids)
+        return {
+            "list 30d": _median_ms(list_recent, repeat) / n,
+            "summarize 30d": _median_ms(insights, repeat) / n,
+            "monthly summary": _median_ms(monthly, repeat) / n,
+        }
+    finally:
+        db.close()
+
+def run_one(args) -> None:
+    from app.database import Base, SessionLocal, engine
+    from app import models
+    from app.archive import ensure_storage, run_archival
+
+    Base.metadata.create_all(bind=engine)
+    ensure_storage(engine)
+    rows = _seed(engine, models, args.users, args.months, args.per_user_month)
+    before = _measure(SessionLocal, args.users, args.repeat)
+    db = SessionLocal()
+    try:
+        stats = run_archival(db)
+    finally:
+        db.close()
+    after = _measure(SessionLocal, args.users, args.repeat)
+    print(f"history {args.months:4d} months, {rows:>10,} rows, archived {stats.get('moved', 0):,}")
+    for name in before:
+        print(f"  {name:16s} hot+cold in one table {before[name]:7.2f} ms   after archival {after[name]:7.2f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--per-user-month", type=int, default=100, help="transactions per user per month")
+    parser.add_argument("--months", type=int, nargs="+", default=[12, 120])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    if len(args.months) == 1:
+        args.months = args.months[0]
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='locksum-part-')}/bench.db"
+        run_one(args)
+        return
+
+    # One subprocess per size so each gets a fresh engine and database.
+    for months in args.months:
+        cmd = [sys.executable, "-m", "benchmarks.partition_latency", "--months", str(months),
+               "--users", str(args.users), "--per-user-month", str(args.per_user_month),
+               "--repeat", str(args.repeat)]
+        subprocess.run(cmd, check=True)
+
+if __name__ == "__main__":
+    main()
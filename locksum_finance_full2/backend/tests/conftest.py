@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+# Must run before app.settings is imported. Never point tests at DATABASE_URL: the fixtures drop tables.
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+
+import pytest
+
+from app.archive import ensure_storage
+from app.database import Base, SessionLocal, engine
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    ensure_storage(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
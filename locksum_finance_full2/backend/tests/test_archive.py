@@ -0,0 +1,214 @@
+import datetime as dt
+import random
+
+import pytest
+from sqlalchemy import func, select, text
+
+from app import models
+from app.ai import summarize_spending
+from app.archive import (
+    archive_month,
+    ensure_storage,
+    get_watermark,
+    hot_cutoff,
+    monthly_category_totals,
+    run_archival,
+    transactions_query,
+)
+from app.database import engine
+
+TODAY = dt.date.today()
+
+def _user(db, email="a@example.com"):
+    user = models.User(email=email, password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+def _txn(db, user, date, amount=10.0, category="Groceries"):
+    txn = models.Transaction(user_id=user.id, name="t", amount=amount, date=date, category=category)
+    db.add(txn)
+    db.commit()
+    return txn.id
+
+def _ids(db, **kwargs):
+    txns = transactions_query(db, **kwargs)
+    return sorted(db.scalars(select(txns.c.id)))
+
+def _count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+def test_archival_moves_cold_rows_and_summarizes_them(db):
+    rng = random.Random(7)
+    users = [_user(db, "a@example.com"), _user(db, "b@example.com")]
+    cutoff = hot_cutoff(hot_months=12)
+    expected = {}
+    for _ in range(600):
+        user = rng.choice(users)
+        date = TODAY - dt.timedelta(days=rng.randint(0, 900))
+        amount = float(rng.randint(1, 500))
+        category = rng.choice(["Groceries", "Rent", "Dining"])
+        db.add(models.Transaction(user_id=user.id, name="t", amount=amount, date=date, category=category))
+        if date < cutoff:
+            key = (user.id, date.replace(day=1), category)
+            total, count = expected.get(key, (0.0, 0))
+            expected[key] = (total + amount, count + 1)
+    db.commit()
+
+    stats = run_archival(db, hot_months=12)
+
+    archived = sum(count for _, count in expected.values())
+    assert stats["moved"] == archived
+    assert _count(db, models.TransactionArchive) == archived
+    assert _count(db, models.Transaction) == 600 - archived
+    assert db.scalar(select(func.min(models.Transaction.date))) >= cutoff
+    assert get_watermark(db) == cutoff
+
+    summaries = {
+        (s.user_id, s.month, s.category): (s.total, s.count)
+        for s in db.query(models.MonthlyCategorySummary)
+    }
+    assert summaries.keys() == expected.keys()
+    for key, (total, count) in expected.items():
+        assert summaries[key][0] == pytest.approx(total)
+        assert summaries[key][1] == count
+
+    if engine.dialect.name == "postgresql":
+        partitions = db.scalar(text(
+            "SELECT count(*) FROM pg_inherits WHERE inhparent = 'transactions_archive'::regclass"
+        ))
+        assert partitions == len({month for _, month, _ in expected})
+
+def test_archival_is_invisible_to_readers(db):
+    user = _user(db)
+    for days in (3, 40, 200, 500, 800):
+        _txn(db, user, TODAY - dt.timedelta(days=days), amount=days)
+    before = [summarize_spending(db, user.id, days=d) for d in (30, 365, 3650)]
+    ids_before = _ids(db, user_id=user.id)
+    monthly_before = monthly_category_totals(db, user.id)
+
+    run_archival(db, hot_months=12)
+
+    assert _count(db, models.TransactionArchive) > 0
+    assert [summarize_spending(db, user.id, days=d) for d in (30, 365, 3650)] == before
+    assert _ids(db, user_id=user.id) == ids_before
+    assert monthly_category_totals(db, user.id) == monthly_before
+
+def test_backdated_row_is_added_to_archived_month_summary(db):
+    user = _user(db)
+    old = hot_cutoff(hot_months=12) - dt.timedelta(days=45)
+    _txn(db, user, old, amount=100.0)
+    run_archival(db, hot_months=12)
+
+    late = _txn(db, user, old.replace(day=1), amount=25.0)
+    assert monthly_category_totals(db, user.id)[0]["total"] == 125.0
+
+    stats = run_archival(db, hot_months=12)
+
+    assert stats["moved"] == 1
+    assert db.get(models.Transaction, late) is None
+    summary = db.query(models.MonthlyCategorySummary).one()
+    assert summary.month == old.replace(day=1)
+    assert (summary.total, summary.count) == (125.0, 2)
+
+def test_transactions_query_reads_archive_only_before_watermark(db):
+    user = _user(db)
+    cold = _txn(db, user, hot_cutoff(hot_months=12) - dt.timedelta(days=10))
+    hot = _txn(db, user, TODAY)
+
+    assert "transactions_archive" not in str(transactions_query(db, user_id=user.id))
+    run_archival(db, hot_months=12)
+    watermark = get_watermark(db)
+
+    recent = transactions_query(db, user_id=user.id, since=watermark)
+    assert "transactions_archive" not in str(recent)
+    assert _ids(db, user_id=user.id, since=watermark) == [hot]
+
+    older = transactions_query(db, user_id=user.id, since=watermark - dt.timedelta(days=1))
+    assert "transactions_archive" in str(older)
+    assert _ids(db, user_id=user.id, since=watermark - dt.timedelta(days=60)) == [cold, hot]
+    assert _ids(db, user_id=user.id) == [cold, hot]
+
+def test_archived_ids_are_not_reused(db):
+    user = _user(db)
+    _txn(db, user, TODAY)
+    newest = _txn(db, user, hot_cutoff(hot_months=12) - dt.timedelta(days=5))
+    run_archival(db, hot_months=12)
+
+    nxt = _txn(db, user, TODAY)
+
+    assert nxt > newest
+    assert len(_ids(db, user_id=user.id)) == len(set(_ids(db, user_id=user.id))) == 3
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="SQLite table rebuild")
+def test_legacy_sqlite_table_is_rebuilt_with_autoincrement(db):
+    user = _user(db)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE transactions")
+        conn.exec_driver_sql(
+            "CREATE TABLE transactions (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "name VARCHAR(255) NOT NULL, amount FLOAT NOT NULL, date DATE NOT NULL, "
+            "category VARCHAR(128) NOT NULL)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO transactions VALUES (1, :u, 't', 5.0, :d, 'Rent'), (2, :u, 't', 7.0, :d, 'Rent')",
+            {"u": user.id, "d": TODAY.isoformat()},
+        )
+        # A row the buggy layout already archived with the highest id.
+        conn.exec_driver_sql(
+            "INSERT INTO transactions_archive VALUES (3, :u, 't', 1.0, '2020-01-05', 'Rent')",
+            {"u": user.id},
+        )
+
+    ensure_storage(engine)
+    ensure_storage(engine)  # idempotent
+
+    with engine.connect() as conn:
+        ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'transactions'"))
+        indexes = set(conn.scalars(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions'"
+        )))
+    assert "AUTOINCREMENT" in ddl.upper()
+    assert {"ix_transactions_user_date", "ix_transactions_date"} <= indexes
+    assert _ids(db, user_id=user.id) == [1, 2]
+    assert _txn(db, user, TODAY) == 4
+
+def test_monthly_totals_widen_until_to_whole_months(db):
+    user = _user(db)
+    month = hot_cutoff(hot_months=12) - dt.timedelta(days=40)
+    month = month.replace(day=1)
+    _txn(db, user, month + dt.timedelta(days=22), amount=30.0)
+    _txn(db, user, TODAY, amount=5.0)
+
+    mid_month = month + dt.timedelta(days=1)
+    hot_result = monthly_category_totals(db, user.id, until=mid_month)
+    run_archival(db, hot_months=12)
+    archived_result = monthly_category_totals(db, user.id, until=mid_month)
+
+    assert hot_result == archived_result
+    assert [(r["month"], r["total"]) for r in archived_result] == [(month, 30.0)]
+    assert monthly_category_totals(db, user.id, until=month) == []
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="advisory lock is Postgres only")
+def test_concurrent_run_is_skipped_while_lock_is_held(db):
+    from app.archive import _PG_LOCK_KEY
+
+    with engine.connect() as holder:
+        assert holder.scalar(text("SELECT pg_try_advisory_lock(:k)"), {"k": _PG_LOCK_KEY})
+        assert "skipped" in run_archival(db, hot_months=12)
+        holder.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _PG_LOCK_KEY})
+    assert "skipped" not in run_archival(db, hot_months=12)
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="archive partitions are Postgres only")
+def test_partition_is_committed_before_rows_move(db):
+    user = _user(db)
+    old = hot_cutoff(hot_months=12) - dt.timedelta(days=45)
+    start = old.replace(day=1)
+    _txn(db, user, old)
+
+    # Leave the month's move uncommitted: archive readers must not wait on it.
+    assert archive_month(db, start, start.replace(day=28) + dt.timedelta(days=4), max_id=10**9) == 1
+    with engine.connect() as reader:
+        reader.execute(text("SET lock_timeout = '1s'"))
+        assert reader.scalar(select(func.count()).select_from(models.TransactionArchive)) == 0
+    db.rollback()
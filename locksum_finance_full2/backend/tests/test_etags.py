@@ -0,0 +1,108 @@
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import models
+from app.auth import get_current_user
+from app.database import get_db
+from app.etags import _etag_matches, bump_data_version, check_not_modified, make_etag
+
+TODAY = dt.date(2024, 3, 15)
+
+@pytest.mark.parametrize("header, etag, expected", [
+    ('W/"1-2-budgets"', 'W/"1-2-budgets"', True),
+    ('"1-2-budgets"', 'W/"1-2-budgets"', True),   # weak comparison ignores W/
+    ('W/"1-2-budgets"', '"1-2-budgets"', True),
+    ("*", 'W/"1-2-budgets"', True),
+    (' * ', 'W/"1-2-budgets"', True),
+    ('W/"1-1-budgets", W/"1-2-budgets"', 'W/"1-2-budgets"', True),
+    ('W/"1-1-budgets",W/"1-2-budgets"', 'W/"1-2-budgets"', True),
+    ('W/"1-1-budgets"', 'W/"1-2-budgets"', False),
+    ('W/"1-2-budgets-x"', 'W/"1-2-budgets"', False),
+    ("", 'W/"1-2-budgets"', False),
+])
+def test_etag_matching(header, etag, expected):
+    assert _etag_matches(header, etag) is expected
+
+def test_variant_changes_the_etag():
+    base = make_etag(1, 3, "insights", 30, {"monthly_savings_target": 300.0}, TODAY)
+    assert make_etag(1, 3, "insights", 30, {"monthly_savings_target": 300.0}, TODAY) == base
+    assert make_etag(1, 3, "insights", 90, {"monthly_savings_target": 300.0}, TODAY) != base
+    assert make_etag(1, 3, "insights", 30, {"monthly_savings_target": 500.0}, TODAY) != base
+    assert make_etag(1, 3, "insights", 30, None, TODAY) != base
+    assert make_etag(1, 3, "insights", 30, {"monthly_savings_target": 300.0}, TODAY + dt.timedelta(days=1)) != base
+    assert make_etag(1, 4, "insights", 30, {"monthly_savings_target": 300.0}, TODAY) != base
+    assert make_etag(2, 3, "insights", 30, {"monthly_savings_target": 300.0}, TODAY) != base
+
+    since, until = dt.date(2024, 1, 1), dt.date(2024, 2, 1)
+    txns = make_etag(1, 3, "transactions", since, until)
+    assert make_etag(1, 3, "transactions", since, None) != txns
+    assert make_etag(1, 3, "transactions", None, until) != txns
+    assert make_etag(1, 3, "transactions", until, since) != txns
+    assert make_etag(1, 3, "transactions") != txns
+
+@pytest.fixture
+def etag_app(db):
+    user = models.User(email="a@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+
+    app = FastAPI()
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=user.id)
+
+    @app.get("/items")
+    def list_items(
+        request: Request,
+        response: Response,
+        since: dt.date | None = None,
+        db: Session = Depends(get_db),
+        user=Depends(get_current_user),
+    ):
+        not_modified = check_not_modified(request, response, db, user.id, "items", since)
+        if not_modified:
+            return not_modified
+        return {"items": []}
+
+    @app.post("/items")
+    def create_item(db: Session = Depends(get_db), user=Depends(get_current_user)):
+        bump_data_version(db, user.id)
+        db.commit()
+        return {}
+
+    return TestClient(app)
+
+def test_conditional_get_round_trip(etag_app):
+    client = etag_app
+
+    first = client.get("/items")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert "last-modified" not in first.headers  # nothing written yet
+
+    cached = client.get("/items", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    # The etag is per query: another range doesn't revalidate against it.
+    assert client.get("/items?since=2024-01-01", headers={"If-None-Match": etag}).status_code == 200
+
+    client.post("/items")
+
+    fresh = client.get("/items", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert "last-modified" in fresh.headers
+    assert client.get("/items", headers={"If-None-Match": fresh.headers["etag"]}).status_code == 304
+
+def test_if_modified_since_alone_is_not_honoured(etag_app):
+    client = etag_app
+    client.post("/items")
+    last_modified = client.get("/items").headers["last-modified"]
+
+    assert client.get("/items", headers={"If-Modified-Since": last_modified}).status_code == 200
@@ -0,0 +1,27 @@
+import csv
+import datetime as dt
+import io
+
+from app.export import EXPORT_COLUMNS, iter_csv
+
+def _rows(data: bytes):
+    return list(csv.reader(io.StringIO(data.decode())))
+
+def test_csv_neutralises_formula_cells():
+    day = dt.date(2024, 1, 5)
+    chunks = [
+        [(1, 7, "=HYPERLINK(\"http://x\")", -12.5, day, "@SUM(A1)")],
+        [(2, 7, "+1", 3.0, day, "-Groceries"), (3, 7, "\ttab", 1.0, day, "\rcr")],
+        [(4, 7, "Coffee = good", 2.0, day, "Dining")],
+    ]
+
+    rows = _rows(b"".join(iter_csv(chunks)))
+
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert [(r[2], r[5]) for r in rows[1:]] == [
+        ("'=HYPERLINK(\"http://x\")", "'@SUM(A1)"),
+        ("'+1", "'-Groceries"),
+        ("'\ttab", "'\rcr"),
+        ("Coffee = good", "Dining"),
+    ]
+    assert rows[1][3] == "-12.5"  # numbers are not text cells
@@ -0,0 +1,174 @@
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+import redis
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app import ratelimit
+from app.auth import get_current_user
+from app.plans import require_min_plan
+from app.ratelimit import (
+    TIER_LIMITS,
+    Admission,
+    ConcurrencyLimiter,
+    InMemoryBackend,
+    RedisBackend,
+    RedisConcurrencyLimiter,
+    TokenBucket,
+    admission,
+    renewing,
+)
+from app.settings import settings
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Replace only app.ratelimit's view of time; fakeredis expires keys by the real clock.
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(time=fake, monotonic=fake))
+    return fake
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # Lua scripting support
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+@pytest.fixture
+def hung_redis_port():
+    """A port that accepts TCP connections but never answers."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    try:
+        yield sock.getsockname()[1]
+    finally:
+        sock.close()
+
+def test_token_bucket_spends_burst_then_refills():
+    limit = TIER_LIMITS["free"]  # burst 5, 5 per minute
+    bucket = TokenBucket(limit, now=0.0)
+
+    assert [bucket.take(0.0) for _ in range(5)] == [0.0] * 5
+    assert bucket.take(0.0) == pytest.approx(12.0)
+    assert bucket.take(6.0) == pytest.approx(6.0)
+    assert bucket.take(12.0) == 0.0
+    assert not bucket.is_full(12.0)
+    assert bucket.is_full(12.0 + 5 * 12.0)
+
+def test_in_memory_backend_evicts_full_buckets(clock):
+    backend = InMemoryBackend(sweep_seconds=10)
+
+    for user_id in range(100):
+        backend.take("ai", user_id, "free")
+    for _ in range(20):
+        backend.take("ai", 1, "plus")  # tier change leaves the old bucket behind
+    assert len(backend) == 101
+
+    clock.now += 13  # the free buckets are full again; the drained plus one needs 40s
+    backend.take("ai", 2, "free")
+    assert len(backend) == 2
+
+    clock.now += 41
+    backend.take("ai", 3, "free")
+    assert len(backend) == 1
+
+def test_redis_bucket_is_shared_between_backends(fake_redis, clock):
+    a, b = RedisBackend(fake_redis), RedisBackend(fake_redis)
+
+    waits = [backend.take("ai", 1, "free") for backend in (a, b, a, b, a)]
+    assert waits == [0.0] * 5
+    assert b.take("ai", 1, "free") == pytest.approx(12.0)
+    assert a.take("ai", 2, "free") == 0.0  # other users are unaffected
+
+    clock.now += 12
+    assert a.take("ai", 1, "free") == 0.0
+    assert 0 < fake_redis.ttl("ratelimit:ai:1:free") <= 61
+
+def test_redis_concurrency_cap_leases_and_renewal(fake_redis, clock):
+    limiter = RedisConcurrencyLimiter(fake_redis, "ratelimit:inflight:test", 2, lease_seconds=10)
+    other = RedisConcurrencyLimiter(fake_redis, "ratelimit:inflight:other", 1, lease_seconds=10)
+
+    first, second = limiter.try_acquire(), limiter.try_acquire()
+    assert first and second
+    assert limiter.try_acquire() is None
+    assert other.try_acquire() is not None  # separate key, separate cap
+
+    limiter.release(second)
+    third = limiter.try_acquire()
+    assert third is not None
+
+    clock.now += 8
+    limiter.renew(first)
+    clock.now += 4  # third's lease has expired, first's has not
+    assert limiter.try_acquire() is not None
+    assert limiter.try_acquire() is None
+
+def test_unreachable_redis_falls_back_to_local_limits():
+    client = redis.Redis(port=1, socket_connect_timeout=0.2, socket_timeout=0.2, retry=None)
+    backend = RedisBackend(client)
+    limiter = RedisConcurrencyLimiter(client, "ratelimit:inflight:test", 1, lease_seconds=10)
+
+    assert [backend.take("ai", 1, "free") for _ in range(5)] == [0.0] * 5
+    assert backend.take("ai", 1, "free") > 0
+    slot = limiter.try_acquire()
+    assert slot is not None
+    assert limiter.try_acquire() is None
+    limiter.release(slot)
+    assert limiter.try_acquire() is not None
+
+def test_hung_redis_times_out_to_fallback(hung_redis_port, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_REDIS_URL", f"redis://127.0.0.1:{hung_redis_port}/0")
+    monkeypatch.setattr(settings, "RATE_LIMIT_REDIS_TIMEOUT_SECONDS", 0.2)
+    backend, expensive, export = ratelimit._make_limiters()
+
+    started = time.monotonic()
+    assert backend.take("ai", 1, "free") == 0.0
+    assert expensive.try_acquire() is not None
+    assert export.try_acquire() is not None
+    assert time.monotonic() - started < 2
+
+def test_renewing_renews_while_streaming():
+    renewed = []
+    limiter = SimpleNamespace(renew=renewed.append)
+
+    assert list(renewing([b"a", b"b", b"c"], limiter, "slot", every_seconds=0)) == [b"a", b"b", b"c"]
+    assert renewed == ["slot"] * 3
+
+@pytest.fixture
+def admission_app(monkeypatch):
+    monkeypatch.setattr(ratelimit, "backend", InMemoryBackend())
+    monkeypatch.setattr(ratelimit, "expensive_limiter", ConcurrencyLimiter(1))
+    monkeypatch.setattr(ratelimit, "admission_metrics", ratelimit.AdmissionMetrics())
+    user = SimpleNamespace(id=1, plan="free", subscription_status=None)
+
+    app = FastAPI()
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    @app.get("/expensive")
+    def expensive(user=Depends(get_current_user), admit: Admission = Depends(admission)):
+        require_min_plan(user, "plus")
+        admit("test")
+        return {"ok": True}
+
+    return TestClient(app), user
+
+def test_rejected_requests_do_not_spend_tokens(admission_app):
+    client, user = admission_app
+
+    assert [client.get("/expensive").status_code for _ in range(10)] == [402] * 10
+    assert ratelimit.admission_metrics.snapshot() == {}
+
+    user.plan, user.subscription_status = "plus", "active"
+    codes = [client.get("/expensive").status_code for _ in range(21)]
+    assert codes == [200] * 20 + [429]  # the slot is released after each response
+    assert ratelimit.admission_metrics.snapshot() == {"test": {"admitted": 20, "rate_limited": 1, "shed": 0}}
@@ -54,11 +54,10 @@ export default function App() {
 
   const loadInsights = async () => {
     try {
-      const res = await axios.post(
-        `${API}/ai/insights`,
-        { monthly_savings_target: 300 },
-        { headers: authHeaders }
-      )
+      const res = await axios.get(`${API}/ai/insights`, {
+        params: { monthly_savings_target: 300 },
+        headers: authHeaders,
+      })
       setInsights(res.data)
     } catch (err) {
       if (err.response && err.response.status === 402) {